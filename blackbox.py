@@ -2,7 +2,12 @@ import sys
 import os
 import time
 import json
+import queue
+import threading
 from datetime import datetime
+from enum import IntEnum
+from types import MappingProxyType
+from itertools import groupby
 import tkinter as tk
 import tkinter.ttk as ttk
 import tkinter.font as tkFont
@@ -10,27 +15,50 @@ import tkinter.font as tkFont
 import ttkwidgets as ttkwdgt
 from SimConnect import *
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+from downsampling import minmax_lttb, m4, warm_up
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SENTINEL = -999999 # stored (and saved) for values SimConnect didn't return
+
+# plots, data and settings are stored relative to where the program was started
+_CWD = os.getcwd()
+_PLOTS_DIR = os.path.join(_CWD, "plots")
+_DATA_DIR = os.path.join(_CWD, "data")
+_SETTINGS_FILE = os.path.join(_CWD, "settings.json")
+
+
+class FlightStatus(IntEnum):
+    """ Flight phases tracked by the DataRecorder, in the order they happen. """
+    STARTING = 0
+    TAXIING_OUT = 1
+    FLYING = 2
+    ROLLOUT = 3
 
 
 class DataRecorder:
     def __init__(self, simvars = []):
-        self._status = "starting"
+        self._status = FlightStatus.STARTING
         self._simvars = simvars
         self.has_init = False
 
-        self._data_dict = {}
-        self._name_dict = {}
-        self._unit_dict = {}
-
-        for var in self._simvars:
-            key = var[0]
-            name = var[1]
-            unit = var[2]
-            self._data_dict[key] = []
-            self._name_dict[key] = name
-            self._unit_dict[key] = unit
+        ## Recording: one float32 row per channel in self._buf, columns filled
+        ## up to self._n, _grow_buffers doubles self._capacity when it is reached.
+        self._capacity = 4096
+        self._n = 0
+        self._channels = [key for key, name, unit, *_ in simvars]
+        self._name_dict = {key: name for key, name, unit, *_ in simvars}
+        self._unit_dict = {key: unit for key, name, unit, *_ in simvars}
+        self._init_buffers()
+        self._fig = None # the figure of the last plot made
 
     def init_simconnect(self):
         """ Connect SimConnect to the Flight Simulator and set up the requests
@@ -54,45 +82,131 @@ class DataRecorder:
 
     def set_simvars(self, simvars = []):
         """ Add new simvars and remove those no longer included in 'simvars'
-        from the data dictionary.
+        from the data dictionary. Simvars that are kept keep their data.
         """
-        keys = []
-        for var in simvars:
-            key = var[0]
-            name = var[1]
-            unit = var[2]
-            keys.append(key)
-            if key in self._simvars:
-                continue
-            self._data_dict[key] = []
-            self._name_dict[key] = name
-            self._unit_dict[key] = unit
-
-        del_keys = []
-        for key in self._data_dict:
-            if not key in keys:
-                del_keys.append(key)
-        
-        for key in del_keys:
-            del self._data_dict[key]
-            del self._name_dict[key]
-            del self._unit_dict[key]
+        old_data = self._data_dict
+        self._channels = [key for key, name, unit, *_ in simvars]
+        self._name_dict = {key: name for key, name, unit, *_ in simvars}
+        self._unit_dict = {key: unit for key, name, unit, *_ in simvars}
+        self._init_buffers()
+        for key, item in self._data_dict.items():
+            if key in old_data:
+                item[:] = old_data[key]
+        if self.has_init:
+            self.setup_requests()
 
     def reset(self):
         """ (Re)set values tracking simulator state and (re)set data dictionaries. """
         if self.has_init:
             self._airborne = False
-            self._status = "starting"
+            self._status = FlightStatus.STARTING
             self._landing_time = 0
-            self._airborne_list = [False]
-            self._time_elapsed = []
+            self._recent_air = 0 # airborne state of the last ticks, one bit each
+            self._air_window = 3 # number of ticks in self._recent_air
             self._events = []
             self._landing_data = {}
             self._takeoff_data = {}
             self._start_time = time.time()
 
-            for key in self._data_dict:
-                self._data_dict[key] = []
+            self._capacity = 4096
+            self._n = 0
+            self._time_elapsed = np.empty(self._capacity)
+            self._init_buffers()
+            self.setup_requests()
+
+    def _init_buffers(self):
+        """ Set up an empty sample buffer with one row per simvar (channel).
+        Samples are stored unrounded as float32, which keeps about 7
+        significant digits and halves the memory used.
+        """
+        self._buf = np.full((len(self._channels), self._capacity), SENTINEL,
+                            dtype = np.float32)
+        self._values = np.empty(len(self._channels)) # the sample being collected
+        self._latest = {} # simvar: last stored value
+        self._make_views()
+
+    def _make_views(self):
+        """ Point self._data_dict at the rows of self._buf. Needs to be redone
+        whenever self._buf is reallocated.
+        """
+        self._data_dict = {key: self._buf[i] for i, key in enumerate(self._channels)}
+
+    def _grow_buffers(self):
+        """ Double the capacity of the sample buffers. """
+        self._capacity *= 2
+        self._time_elapsed = np.resize(self._time_elapsed, self._capacity)
+        self._buf = np.concatenate((self._buf, np.full_like(self._buf, SENTINEL)), axis = 1)
+        self._make_views()
+
+    def setup_requests(self):
+        """ Look up the SimConnect request object of every tracked simvar once,
+        so that all of them can be sent together in fetch_values.
+        Indexed simvars (e.g. "GENERAL_ENG_RPM:1") share a single request object
+        per simvar name, so those are left to AircraftRequests.get.
+        """
+        aq = self._aq
+        self._requests = [] # (channel index, request object)
+        self._get_keys = [] # (channel index, simvar) read with AircraftRequests.get
+        self._ground_request = None
+        self._requested_time = None # when the last requests were sent
+        for i, key in [(None, "SIM_ON_GROUND"), *enumerate(self._channels)]:
+            request = None
+            if not ":" in key:
+                request = aq.find(key)
+                if request is not None and not request._deff_test():
+                    request = None
+            if i is None:
+                self._ground_request = request
+            elif request is None:
+                self._get_keys.append((i, key))
+            else:
+                self._requests.append((i, request))
+
+    def fetch_values(self):
+        """ Collect the answers to the data requests sent on the previous call
+        into self._values (in channel order), then send new requests for all
+        tracked simvars at once. SimConnect's dispatch thread stores the answers
+        as they arrive, so this doesn't wait on the simulator; the values are one
+        polling period old instead. Unanswered requests are set to SENTINEL.
+        Returns the time the values were requested (None on the first call) and
+        the value of SIM_ON_GROUND.
+        """
+        values = self._values
+        sample_time = self._requested_time
+        for i, request in self._requests:
+            value = request.outData
+            if value is None:
+                values[i] = SENTINEL
+            else:
+                try:
+                    values[i] = value
+                except (TypeError, ValueError):
+                    values[i] = SENTINEL # a value that isn't a number
+
+        # indexed simvars (and any find() couldn't resolve) wait on SimConnect here
+        for i, key in self._get_keys:
+            value = self._aq.get(key)
+            try:
+                values[i] = SENTINEL if value is None else value
+            except (TypeError, ValueError):
+                values[i] = SENTINEL
+
+        ground_request = self._ground_request
+        if ground_request is None:
+            on_the_ground = self._aq.get("SIM_ON_GROUND")
+        else:
+            on_the_ground = ground_request.outData
+        if on_the_ground is None:
+            on_the_ground = SENTINEL
+
+        self._requested_time = time.time()
+        request_data = self._simconnect.request_data
+        if ground_request is not None:
+            request_data(ground_request)
+        for i, request in self._requests:
+            request_data(request)
+
+        return sample_time, on_the_ground
 
     def get_simvars(self):
         return self._simvars
@@ -108,75 +222,86 @@ class DataRecorder:
         Stores the history of the data in the `data_dict` dictionary
         """
         self._events = []
-        aq = self._aq
-        on_the_ground = aq.get("SIM_ON_GROUND")
-        if on_the_ground == -999999:
+        sample_time, on_the_ground = self.fetch_values()
+        if sample_time is None:
+            return # the first requests were just sent
+        n = self._n
+        if n == self._capacity:
+            self._grow_buffers()
+
+        if on_the_ground == SENTINEL:
             pass # keep the last value for self.airborne
             if not hasattr(self, "airborne"):
                 self.airborne = False
         else:
             self.airborne = not on_the_ground
             
-        if (self.airborne
-                and (self._status == "starting"
-                     or self._status == "taxiing out")
-                and len(self._airborne_list) > 2):
-            if all(self._airborne_list[-3:]):
+        window = self._air_window
+        all_air = (1 << window) - 1
+        if self.airborne and self._status <= FlightStatus.TAXIING_OUT: # not yet flown
+            if self._recent_air == all_air:
                 print("Takeoff detected...")
-                self._status = "flying"
+                self._status = FlightStatus.FLYING
 
-                for key, item in self._data_dict.items():
-                    item_ = np.array(item[-3:])
-                    item_ = item_[item_ != -999999]
-                    if len(item_) == 0:
-                        item_ = [-999999]
-                    self._takeoff_data[key] = item[-3:-1]
+                self._takeoff_data = self._event_window(max(n - window, 0), n - 1)
 
                 self._events.append("takeoff")
                 
-        self._airborne_list.append(self.airborne)
-        if len(self._airborne_list) > 100:
-            self._airborne_list.pop(0)
+        self._recent_air = ((self._recent_air << 1) | int(self.airborne)) & all_air
 
-        for key, item in self._data_dict.items():
-            try:
-                item.append(round(aq.get(key), 4))
-            except Exception as e:
-                item.append(-999999)
+        values = self._values
+        # timed out requests (SENTINEL) are stored as they are, clean_data
+        # interpolates over them at the end of the recording
+        self._buf[:, n] = values
+        self._latest = dict(zip(self._channels, values.tolist()))
 
-        time_elapsed = time.time() - self._start_time
-        self._time_elapsed.append(time_elapsed)
+        time_elapsed = sample_time - self._start_time
+        self._time_elapsed[n] = time_elapsed
+        self._n = n = n + 1
 
 
-        if self._status == "flying" and not any(self._airborne_list[-3:]) and not "takeoff" in self._events:
+        if (self._status == FlightStatus.FLYING
+                and self._recent_air == 0
+                and not "takeoff" in self._events):
             print("Landing detected...")
-            self._status = "rollout"
+            self._status = FlightStatus.ROLLOUT
             self._landing_time = time_elapsed
-            self._landing_data = {"LANDING_TIME": self._landing_time}
-            for key, item in self._data_dict.items():
-                item_ = np.array(item[-4:])
-                item_ = item_[item != -999999]
-                if len(item_) == 0:
-                    item_ = [-999999]
-                self._landing_data[key] = item_
+            self._landing_data = {"LANDING_TIME": self._landing_time,
+                                  **self._event_window(max(n - window - 1, 0), n)}
 
             self._events.append("landing")
 
+    def _event_window(self, start, stop):
+        """ The samples start:stop of every simvar, without the timed out ones
+        ([SENTINEL] if none are left). The arrays are copies, so clean_data
+        doesn't change them.
+        """
+        window = {}
+        for key, item in self._data_dict.items():
+            item = item[start:stop]
+            item = item[item != SENTINEL]
+            window[key] = item if len(item) else [SENTINEL]
+        return window
+
     @property
     def simvars(self):
         return self._simvars
 
     @property
     def status(self):
-        return self._status
+        return self._status.name.lower().replace("_", " ") # e.g. "taxiing out"
     
     @property
     def time_elapsed(self):
-        return self._time_elapsed[-1]
+        return self._time_elapsed[self._n - 1]
 
     @property
     def data_dict(self):
-        return self._data_dict.copy()
+        """ Read-only view of the recorded data. The arrays are views of the
+        sample buffers, not copies.
+        """
+        n = self._n
+        return MappingProxyType({key: item[:n] for key, item in self._data_dict.items()})
 
     @property
     def name_dict(self):
@@ -184,114 +309,205 @@ class DataRecorder:
 
     @property
     def latest_data(self):
-        ret_dict = {}
-        for key, item in self._data_dict.items():
-            ret_dict[key] = item[-1]
-        return ret_dict
+        """ The values of the last sample. Replaced, not changed, on every
+        sample, so it is safe to read while the next one is collected.
+        """
+        return self._latest
 
     @property
     def landing_data(self):
-        return self._landing_data.copy()
+        return MappingProxyType(self._landing_data)
 
     @property
     def takeoff_data(self):
-        return self._takeoff_data.copy()
+        return MappingProxyType(self._takeoff_data)
 
     @property
     def events(self):
         return self._events
 
-    def make_plot(self, filename, tree_data, skip_indices = 1):
-        """ Create and save the plot for the latest run. """
-        remove_items = []
-        for item in tree_data:
-            if item[-1] == False:
-                # remove items with disabled plot tickbox
-                remove_items.append(item)
-        for item in remove_items:
-            tree_data.remove(item)
-
-        tree_data = np.array(tree_data)
-        rows = tree_data[:,4].astype(int)
-        cols = tree_data[:,5].astype(int)
-        max_rows = rows.max()
-        max_cols = cols.max()
-
-        fig, axs = plt.subplots(max_rows, max_cols, figsize = (13,10))
-
-        for item in tree_data:
-            if max_rows == max_cols == 1:
-                ax = axs
-            elif max_rows == 1:
-                col = int(item[5]) - 1
-                ax = axs[col]
-            elif max_cols == 1:
-                row = int(item[4]) - 1
-                ax = axs[row]
-            else:
-                row = int(item[4]) - 1
-                col = int(item[5]) - 1
-                ax = axs[row, col]
+    def recorded(self, key):
+        """ The elapsed times and values of a simvar recorded so far, leaving
+        out timed out requests. Safe to call while collecting on the thread.
+        """
+        n = self._n # before the buffers, those hold at least n samples
+        time_elapsed = self._time_elapsed[:n]
+        item = self._data_dict[key][:n]
+        valid = item != SENTINEL
+        return time_elapsed[valid], item[valid]
+
+    def start_collecting(self, interval = 0.05):
+        """ Collect data on a background thread every `interval` seconds until
+        stop_collecting is called, so that waiting for SimConnect never blocks
+        the UI. Takeoffs and landings are passed on through pop_events.
+        The UI only reads the latest sample, so it can refresh at its own rate.
+        """
+        # takeoff and landing need the same airborne state for ~0.75 s
+        self._air_window = max(3, round(0.75/interval))
+        self._event_queue = queue.SimpleQueue() # (event, time elapsed)
+        self._stop_collecting = threading.Event()
+        self._collector = threading.Thread(target = self._collect_loop,
+                                           args = (interval,), daemon = True)
+        self._collector.start()
+
+    def stop_collecting(self):
+        """ Stop the background collection, after the sample in progress. """
+        self._stop_collecting.set()
+        self._collector.join()
+
+    def _collect_loop(self, interval):
+        # a fixed schedule, so the time spent collecting doesn't slow the rate
+        next_time = time.monotonic() + interval
+        while not self._stop_collecting.wait(max(next_time - time.monotonic(), 0)):
+            self.collect_latest_data()
+            for event in self._events:
+                self._event_queue.put((event, self.time_elapsed))
+            next_time += interval
+            now = time.monotonic()
+            if next_time < now:
+                next_time = now + interval # fell behind (e.g. a blocking get), don't catch up
+
+    def pop_events(self):
+        """ The (event, time elapsed) pairs detected since the last call. """
+        events = []
+        while True:
+            try:
+                events.append(self._event_queue.get_nowait())
+            except queue.Empty:
+                return events
 
-            ax.plot(self._time_elapsed[1:-1:skip_indices],
-                    self._data_dict[item[0]][1:-1:skip_indices],
-                    label = self._name_dict[item[0]])
+    def make_plot(self, filename, tree_data):
+        """ Create and save the plot for the latest run. Each series is reduced
+        with `m4` to the pixel width of its axis before plotting.
+        """
+        n = self._n
+        tree_data = np.array(tree_data, dtype = object)
+        tree_data = tree_data[tree_data[:,-1].astype(bool)] # only items with the plot tickbox set
+        rows = tree_data[:,4].astype(int) - 1
+        cols = tree_data[:,5].astype(int) - 1
+
+        # a plain Figure, pyplot's figure managers aren't needed to save it
+        dpi = 300
+        fig = Figure(figsize = (13,10))
+        axs = fig.subplots(rows.max() + 1, cols.max() + 1, squeeze = False) # always 2D
+        width_px = int(fig.get_figwidth()*dpi/axs.shape[1]) # upper bound per axis
+
+        # go through the axes in order, items sharing an axis keep the tree order
+        # the first and last samples are left out; with fewer than 3 samples
+        # nothing is plotted (n - 1 mustn't turn into an index from the end)
+        keep = slice(1, max(n - 1, 1))
+        time_elapsed = self._time_elapsed[keep]
+        order = np.lexsort((cols, rows))
+        for (row, col), group in groupby(order, key = lambda i: (rows[i], cols[i])):
+            ax = axs[row, col]
+            keys = tree_data[list(group), 0]
+            segments = [np.column_stack(m4(time_elapsed, self._data_dict[key][keep], width_px))
+                        for key in keys]
+            colors = [f"C{j}" for j in range(len(keys))] # the default color cycle
+            # all series of an axis as one artist, drawn in a single pass
+            ax.add_collection(LineCollection(segments, colors = colors, rasterized = True))
+            ax.autoscale_view()
+
+            # labels and legend once per axis, the unit is that of the last item
             ax.set_xlabel("Time elapsed")
-            ax.set_ylabel(self._unit_dict[item[0]])
-            ax.legend()
+            ax.set_ylabel(self._unit_dict[keys[-1]])
+            ax.legend(handles = [Line2D([], [], color = color, label = self._name_dict[key])
+                                 for key, color in zip(keys, colors)])
 
-        path = os.path.join(os.getcwd(), "plots", filename)
-        fig.savefig(path, dpi = 300)
+        path = os.path.join(_PLOTS_DIR, filename)
+        fig.savefig(path, dpi = dpi)
+        self._fig = fig
 
     def show_plot(self):
-        """ Shows the latest figure. """
-        plt.show()
+        """ Shows the latest figure in a new window. Every run gets its own
+        Figure, so windows of earlier runs stay intact; a figure is cleared
+        when its window is closed.
+        """
+        fig = self._fig
+        if fig is None:
+            return # no plot made yet
+        window = tk.Toplevel()
+        window.title("Blackbox plot")
+        canvas = FigureCanvasTkAgg(fig, master = window)
+        NavigationToolbar2Tk(canvas, window)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill = tk.BOTH, expand = True)
+
+        def close():
+            fig.clear() # drop the plotted data right away
+            if self._fig is fig:
+                self._fig = None
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", close)
 
     def clean_data(self):
-        """ Interpolates for the values where SimConnect returned -999999 """
+        """ Interpolates for the values where SimConnect returned SENTINEL.
+        Missing values before the first or after the last valid one are set
+        to that valid value. Returns the cleaned series rounded to 4 decimals
+        for store_json, made in the same pass over each simvar.
+        """
+        n = self._n
+        x = np.arange(n)
+        rounded = {}
         for key, item in self._data_dict.items():
-            y = np.array(item)
-            if y[-1] == -999999:
-                y[-1] = y[y != -999999][-1]
-            if y[0] == -999999:
-                y[0] = y[y != -999999][0]
-            x = np.arange(len(y))
-            idx = np.where(y != -999999)
-            try:
-                f = interp1d(x[idx], y[idx])
-                self._data_dict[key] = f(x)
-            except Exception as e:
-                print(f"Couldn't interpolate {key}: {e}")         
-                print(min(item[item != -999999]))   
-
-
-    def store_json(self, filename):
-        """ Store the latest data as a JSON file. """
+            y = item[:n]
+            valid = y != SENTINEL
+            if not valid.all():
+                if valid.any():
+                    y[:] = np.interp(x, x[valid], y[valid])
+                else:
+                    print(f"Couldn't interpolate {key}: no valid values")
+            rounded[key] = np.round(y, 4)
+        return rounded
+
+    def store_json(self, filename, series = None):
+        """ Store the latest data as a JSON file. The values are rounded to 4
+        decimals, they are stored unrounded while recording. 'series' are
+        already rounded values per simvar, as returned by clean_data.
+        """
         try:
-            path = os.path.join(os.getcwd(), "data", filename)
-            store_dict = self.data_dict.copy()
-            store_dict["ELAPSED_TIME"] = self._time_elapsed
+            path = os.path.join(_DATA_DIR, filename)
+            n = self._n
+            if series is None:
+                series = {key: np.round(item[:n], 4) for key, item in self._data_dict.items()}
+            store_dict = {**series, "ELAPSED_TIME": self._time_elapsed[:n]}
             for key, item in self._landing_data.items():
-                try:
-                    store_dict[f"LANDING_{key}"] = item.tolist()
-                except Exception as e:
-                    print(f"Attempted converting {key} to list. Failed because: {e}")
-            for key, item in store_dict.items():
-                try:
-                    store_dict[key] = item.tolist()
-                except Exception as e:
-                    print(f"Attempted converting {key} to list. Failed because: {e}")
-            with open(path, "w") as outfile:
-                json.dump(store_dict, outfile)
+                store_dict[f"LANDING_{key}"] = np.round(item, 4)
+            if orjson is not None:
+                # orjson serializes NumPy arrays directly, without converting to lists
+                with open(path, "wb") as outfile:
+                    outfile.write(orjson.dumps(store_dict, option = orjson.OPT_SERIALIZE_NUMPY))
+            else:
+                for key, item in store_dict.items():
+                    if isinstance(item, np.ndarray):
+                        store_dict[key] = item.tolist()
+                with open(path, "w") as outfile:
+                    json.dump(store_dict, outfile)
         except Exception as e:
             print(f"Couldn't save as JSON: {e}")
 
 
+def _mean(values):
+    return sum(values)/len(values)
+
+
 class Window_BB:
+    # simvar: (function reducing the samples around the event to one value, format)
+    _TAKEOFF_TEXT = {"G_FORCE":            (_mean, "{:.2f}"),
+                     "AIRSPEED_INDICATED": (_mean, "{:.0f} kts"),
+                     "GROUND_VELOCITY":    (_mean, "{:.0f} kts"),
+                     }
+    _LANDING_TEXT = {"G_FORCE":            (max,   "{:.2f}"),
+                     "VERTICAL_SPEED":     (min,   "{:.0f} ft/min"),
+                     "AIRSPEED_INDICATED": (_mean, "{:.0f} kts"),
+                     "GROUND_VELOCITY":    (_mean, "{:.0f} kts"),
+                     }
+
     def __init__(self, default_simvars):
         self._default_simvars = default_simvars
         self._data_recorder = DataRecorder(default_simvars)
         self._make_ui()
+        self._rows = {} # tree row id: values of that row, in tree order
         self._setup_tree()
         self._recording = False
         self._lbl_status["text"] = "Status: Ready"
@@ -393,6 +609,12 @@ class Window_BB:
         self._lbl_lastevent = tk.Label(frm_program, text = "No recent events")
         self._lbl_lastevent.grid(row = 2, column = 0, sticky = "sw", padx = 5, pady = 5)
 
+        # live plot of the recording, laid out like the final plot
+        self._live_fig = Figure(figsize = (5,4))
+        self._live_canvas = FigureCanvasTkAgg(self._live_fig, master = frm_program)
+        self._live_canvas.get_tk_widget().grid(row = 0, column = 1, sticky = "nsew", padx = 5)
+        self._live_lines = {} # simvar: line in the live plot
+
         """
 
         frm_pushback_helper = ttk.Frame(frm_program)
@@ -464,10 +686,20 @@ class Window_BB:
                 print("init_simconnect")
                 self._data_recorder.init_simconnect()
             self._data_recorder.reset()
+            self._data_recorder.start_collecting()
             self._lbl_status["text"] = "Status: Recording"
+            self._loop_id = self._window.after(250, self.record_loop)
+            # compile the live plot's downsampling off the Tk thread, it is
+            # first needed once a series passes 1000 samples
+            threading.Thread(target = warm_up, daemon = True).start()
+            self.setup_live_plot()
+            self._live_id = self._window.after(1000, self.live_plot_loop)
         else:
             self._recording = False
             self._btn_record["text"] = "Start"
+            self._window.after_cancel(self._loop_id)
+            self._window.after_cancel(self._live_id)
+            self._data_recorder.stop_collecting()
             self.enable_frame(self._frm_newentries)
             self._btn_reset.configure(state = "normal")
             self._btn_deleteitem.configure(state = "normal")
@@ -477,9 +709,10 @@ class Window_BB:
             flight_name = self._ent_flightname.get()
             if flight_name == "Name your flight":
                 flight_name = "unnamed"
-            self._data_recorder.clean_data()
-            self._data_recorder.make_plot(f"{flight_name.replace(' ', '_')}.pdf", self.tree_items)
-            self._data_recorder.store_json(f"{flight_name.replace(' ', '_')}.json")
+            series = self._data_recorder.clean_data()
+            safe_name = flight_name.replace(" ", "_")
+            self._data_recorder.make_plot(f"{safe_name}.pdf", self.tree_items)
+            self._data_recorder.store_json(f"{safe_name}.json", series)
             self._data_recorder.show_plot()
 
     def cfg_plot(self):
@@ -537,16 +770,15 @@ class Window_BB:
         for row, item in self._entries.items():
             prow = item[0].get()
             pcol = item[1].get()
-            values = self._tree_simvars.item(row)["values"]
-            key, name, unit, latest_data = values[:4]
-            self._tree_simvars.item(row, values = [key, name, unit,
-                    	                           latest_data,
-                                                   prow, pcol])
+            self._rows[row][4:6] = prow, pcol
+            self._tree_simvars.set(row, "prow", prow)
+            self._tree_simvars.set(row, "pcol", pcol)
         self._cfg_plot_window.destroy()
 
     def remove_current_from_tree(self):
         current = self._tree_simvars.focus()
         self._tree_simvars.delete(current)
+        del self._rows[current]
 
         self._data_recorder.set_simvars(self.tree_items)
 
@@ -568,7 +800,9 @@ class Window_BB:
                                        message = "Entry already exists!")
                 return
         
-        self._tree_simvars.insert("", "end", values = (simvar, name, unit, "N/A", 1, 1))
+        values = [simvar, name, unit, "N/A", 1, 1]
+        row = self._tree_simvars.insert("", "end", values = values)
+        self._rows[row] = values
         self._ent_newsimvar.delete(0, tk.END)
         self._ent_newname.delete(0, tk.END)
         self._ent_newunit.delete(0, tk.END)
@@ -576,16 +810,12 @@ class Window_BB:
         self._data_recorder.set_simvars(self.tree_items)
 
     def get_tree_items(self):
-        rows = self._tree_simvars.get_children()
-        checked = self._tree_simvars.get_checked()
-        ret_list = []
-        for row in rows:
-            if row in checked:
-                this_checked = True
-            else:
-                this_checked = False
-            ret_list.append(self._tree_simvars.item(row)["values"] + [this_checked])
-        return ret_list
+        """ The values of every row in the tree, with whether its plot tickbox
+        is checked appended. Row values are kept in self._rows, so only the
+        checked rows need to be asked from Tk, in a single call.
+        """
+        checked = set(self._tree_simvars.tag_has("checked"))
+        return [[*values, row in checked] for row, values in self._rows.items()]
 
     def angle_converter(self, angle):
         """ Converts from an angle to a 32 bit integer representing that angle
@@ -625,7 +855,7 @@ class Window_BB:
 
     def _save_settings(self):
         items = self.tree_items
-        with open(os.path.join(os.getcwd(), "settings.json"), "w") as outfile:
+        with open(_SETTINGS_FILE, "w") as outfile:
             json.dump(items, outfile)
 
     @property
@@ -650,82 +880,117 @@ class Window_BB:
         self._tree_simvars.column("unit", width = 50)
         self._tree_simvars.column("value", width = 60)
 
-        if os.path.isfile(os.path.join(os.getcwd(), "settings.json")):
-            with open(os.path.join(os.getcwd(), "settings.json"), "r") as infile:
+        if os.path.isfile(_SETTINGS_FILE):
+            with open(_SETTINGS_FILE, "r") as infile:
                 items = json.load(infile)
             for item in items:
-                self._tree_simvars.insert("", "end", values = item[:-1])
+                row = self._tree_simvars.insert("", "end", values = item[:-1])
+                self._rows[row] = item[:-1]
                 if item[-1]:
-                    row = self._tree_simvars.get_children()[-1]
                     self._tree_simvars.change_state(row, "checked")
             self._data_recorder.set_simvars(self.tree_items)
 
         else:
             for item in default_simvars:
                 item += ["N/A", 1, 1]
-                self._tree_simvars.insert("", "end", values = item)
+                row = self._tree_simvars.insert("", "end", values = item)
+                self._rows[row] = list(item)
 
             rows = self._tree_simvars.get_children()
             for row in rows:
                 self._tree_simvars.change_state(row, "checked")
 
     def record_loop(self):
-        """ Collect latest data and display it to the user """
+        """ Display the latest data to the user. The data is collected on the
+        DataRecorder's own thread.
+        """
+        self.show_latest_data()
+        
+        # only scheduled while recording, toggle_recording cancels it
+        self._loop_id = self._window.after(250, self.record_loop)
+
+    def setup_live_plot(self):
+        """ Create an empty line in the live plot for every simvar with the
+        plot tickbox set, on the plot row and column set for it.
+        """
+        fig = self._live_fig
+        fig.clear()
+        self._live_lines = {}
+        items = [item for item in self.tree_items if item[-1]]
+        if items:
+            rows = [int(item[4]) for item in items]
+            cols = [int(item[5]) for item in items]
+            axs = fig.subplots(max(rows), max(cols), squeeze = False)
+            for item, row, col in zip(items, rows, cols):
+                self._live_lines[item[0]], = axs[row - 1, col - 1].plot([], [], label = item[1])
+            for ax in axs.flat:
+                ax.legend(loc = "upper left", fontsize = "x-small")
+        self._live_canvas.draw_idle()
+
+    def live_plot_loop(self):
+        """ Update the live plot with the data recorded so far, once a second.
+        Each line is downsampled to 1000 points, which keeps drawing cheap;
+        collecting and downsampling the series still takes time linear in the
+        number of samples recorded (a few ms per 100k samples).
+        """
+        dr = self._data_recorder
+        for key, line in self._live_lines.items():
+            line.set_data(*minmax_lttb(*dr.recorded(key), n_out = 1000))
+        for ax in self._live_fig.axes:
+            ax.relim()
+            ax.autoscale_view()
+        self._live_canvas.draw_idle()
+
+        # only scheduled while recording, toggle_recording cancels it
+        self._live_id = self._window.after(1000, self.live_plot_loop)
+
+    def show_latest_data(self):
+        """ Display the latest collected data and events to the user. """
         dr = self._data_recorder
-        if self._recording:
-            dr.collect_latest_data()
-            latest_data = dr.latest_data
-
-            if "takeoff" in dr.events:
-                text = f"Takeoff at {dr.time_elapsed:.1f} s | "
-                for key, item in dr.takeoff_data.items():
-                    try:
-                        name = dr.name_dict[key]
-                    except KeyError:
-                        continue
-                    if key == "G_FORCE":
-                        text += f"{name}: {np.average(item):.2f} | "
-                    if key == "AIRSPEED_INDICATED" or key == "GROUND_VELOCITY":
-                        text += f"{name}: {np.average(item):.0f} kts | "
-                self._lbl_lastevent["text"] = text
-
-            if "landing" in dr.events:
-                text = f"Landing at {dr.time_elapsed:.1f} s | "
-                for key, item in dr.landing_data.items():
-                    try:
-                        name = dr.name_dict[key]
-                    except KeyError:
-                        continue
-                    if key == "G_FORCE":
-                        item = np.max(item)
-                        text += f"{name}: {item:.2f} | "
-                    if key == "VERTICAL_SPEED":
-                        item = np.min(item)
-                        text += f"{name}: {item:.0f} ft/min | "
-                    if key == "AIRSPEED_INDICATED" or key == "GROUND_VELOCITY":
-                        text += f"{name}: {np.average(item):.0f} kts | "
-
-                self._lbl_lastevent["text"] = text
+        latest_data = dr.latest_data
+
+        for event, time_elapsed in dr.pop_events():
+            if event == "takeoff":
+                self.show_takeoff(time_elapsed)
+            if event == "landing":
+                self.show_landing(time_elapsed)
+
+        # only the value column changes, rows keep their last value on a timeout
+        for row, values in self._rows.items():
+            key = values[0]
+            if not key in latest_data:
+                continue
+            value = latest_data[key]
+            if value == SENTINEL:
+                continue
+            value = round(value, 4)
+            if value != values[3]: # skip the Tcl round trip for unchanged values
+                values[3] = value
+                self._tree_simvars.set(row, "value", value)
+
+    def show_takeoff(self, time_elapsed):
+        self.show_event("Takeoff", time_elapsed, self._data_recorder.takeoff_data,
+                        self._TAKEOFF_TEXT)
+
+    def show_landing(self, time_elapsed):
+        self.show_event("Landing", time_elapsed, self._data_recorder.landing_data,
+                        self._LANDING_TEXT)
+
+    def show_event(self, event, time_elapsed, event_data, formats):
+        """ Show the simvars of 'event_data' that have an entry in 'formats',
+        each reduced to a single value, in the last event label.
+        """
+        name_dict = self._data_recorder.name_dict
+        text = f"{event} at {time_elapsed:.1f} s | "
+        for key, item in event_data.items():
+            if not key in formats or not key in name_dict:
+                continue
+            reduce, fmt = formats[key]
+            text += f"{name_dict[key]}: {fmt.format(reduce(item))} | "
 
-            rows = self._tree_simvars.get_children()
-            for row in rows:
-                values = self._tree_simvars.item(row)["values"]
-                key, name, unit = values[:3]
-                last_val = values[3]
-                if not key in latest_data:
-                    continue
-                if latest_data[key] == -999999:
-                    new_val = last_val
-                else:
-                    new_val = latest_data[key]
-                prow, pcol = values[4:]
-                self._tree_simvars.item(row, values = [key, name, unit,
-                    	                               new_val, prow, pcol])
-        
-        self._window.after(250, self.record_loop)
+        self._lbl_lastevent["text"] = text
 
     def mainloop(self):
-        self._window.after(250, self.record_loop)
         self._window.mainloop()
 
 
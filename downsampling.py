@@ -0,0 +1,110 @@
+""" Downsampling of (x, y) series for plotting, shared by blackbox.py and old.py. """
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """ Numba isn't installed, run the decorated function as plain Python. """
+        def decorator(func):
+            return func
+        return decorator
+
+
+@njit(cache = True)
+def lttb(x, y, n_out):
+    """ Downsample the series (x, y) to `n_out` points with the
+    Largest-Triangle-Three-Buckets algorithm. The first and last points are
+    kept, and from every bucket in between the point forming the largest
+    triangle with the previously chosen point and the average of the next
+    bucket is picked.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    out_x = np.empty(n_out, dtype = x.dtype)
+    out_y = np.empty(n_out, dtype = y.dtype)
+    out_x[0] = x[0]
+    out_y[0] = y[0]
+
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        avg_start = int((i + 1)*every) + 1
+        avg_end = min(int((i + 2)*every) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        range_start = int(i*every) + 1
+        range_end = int((i + 1)*every) + 1
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((x[a] - avg_x)*(y[j] - y[a]) - (x[a] - x[j])*(avg_y - y[a]))
+            if area > max_area:
+                max_area = area
+                next_a = j
+
+        out_x[i + 1] = x[next_a]
+        out_y[i + 1] = y[next_a]
+        a = next_a
+
+    out_x[n_out - 1] = x[n - 1]
+    out_y[n_out - 1] = y[n - 1]
+    return out_x, out_y
+
+
+def warm_up():
+    """ Compile lttb for the float64 arrays minmax_lttb passes it (a no-op
+    without Numba), so the first real call doesn't wait on the compiler.
+    """
+    x = np.arange(8, dtype = np.float64)
+    lttb(x, x, 4)
+
+
+def minmax_lttb(x, y, n_out = 4000, ratio = 4):
+    """ Reduce the series (x, y) to `n_out` points for plotting with MinMaxLTTB.
+    The samples are split into n_out*ratio/2 buckets of which only the minimum
+    and maximum are kept (in their original order), then LTTB picks the final
+    points among those. This keeps short peaks and is much faster than running
+    LTTB on the whole series.
+    """
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    if len(y) <= n_out:
+        return x, y
+
+    bucket = len(y)//(n_out*ratio//2)
+    if bucket >= 2:
+        n = bucket*(len(y)//bucket)
+        x_b = x[:n].reshape(-1, bucket)
+        y_b = y[:n].reshape(-1, bucket)
+        i_min = y_b.argmin(axis = 1)
+        i_max = y_b.argmax(axis = 1)
+        idx = np.stack((np.minimum(i_min, i_max), np.maximum(i_min, i_max)), axis = 1)
+
+        x = np.concatenate((np.take_along_axis(x_b, idx, axis = 1).ravel(), x[n:]))
+        y = np.concatenate((np.take_along_axis(y_b, idx, axis = 1).ravel(), y[n:]))
+    return lttb(x, y, n_out)
+
+
+def m4(x, y, n_bins):
+    """ Reduce the series (x, y) with M4 aggregation for drawing `n_bins`
+    pixels wide: of each bin only the first, last, minimum and maximum point
+    are kept, in their original order. A line drawn through those covers
+    the same pixels as one drawn through all points.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= 4*n_bins:
+        return x, y
+
+    starts = np.linspace(0, n, n_bins + 1).astype(int)
+    bins = np.repeat(np.arange(n_bins), np.diff(starts))
+    order = np.lexsort((y, bins)) # by bin, then by value within the bin
+    first = starts[:-1]
+    last = starts[1:] - 1
+    idx = np.unique(np.concatenate((first, last, order[first], order[last])))
+    return x[idx], y[idx]
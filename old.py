@@ -1,3 +1,65 @@
+import os
+import io
+import math
+import time
+import json
+import csv
+import queue
+import threading
+import multiprocessing
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+from SimConnect import *
+import numpy as np
+
+from downsampling import lttb
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def auto_end(vs, gs, air_count, elapsed_ns, has_been_airborne, airborne):
+    """ Decide whether the recording should end automatically.
+    True if the plane has at one point been airborne, more than 50 seconds have
+    passed since the logger was started, the speed of the aircraft is less than
+    30 and the plane has been on the ground for the whole airborne ring
+    (`air_count` is the number of airborne entries in it) or is standing still
+    on the ground. The cheap checks come first.
+    """
+    if not has_been_airborne or elapsed_ns <= 50 * 10**9:
+        return False
+    speed_tot = math.hypot(vs, gs)
+    return speed_tot < 30 and (air_count == 0 or (speed_tot < 2 and not airborne))
+
+
+def export_recording(snapshot, plot_filename, json_filename):
+    """ Save the plot and JSON file of a finished recording.
+    Runs in a worker process, so the UI isn't blocked while matplotlib renders.
+    `snapshot` holds the sample buffers of the Recorder that made the recording.
+    """
+    recorder = Recorder()
+    recorder.__dict__.update(snapshot)
+    recorder.make_plot(plot_filename)
+    import matplotlib.pyplot as plt
+    plt.close(recorder.fig) # the worker lives as long as the program, don't keep figures
+    recorder.store_json(json_filename)
+
+
+def show_recording(snapshot):
+    """ Show the plot of a finished recording. Runs in a process of its own,
+    so an open plot window holds up neither the UI nor later exports.
+    """
+    recorder = Recorder()
+    recorder.__dict__.update(snapshot)
+    recorder.make_plot()
+    recorder.show_plot()
+
+
 class Recorder:
     def __init__(self):
         """ Variables for Pygame """
@@ -28,26 +90,43 @@ class Recorder:
         self._running = True
 
         pygame.font.init()
-        self._fonts = {}
-        for i in range(11, 30):
-            self._fonts[i] = pygame.font.Font(os.path.join(os.getcwd(), "font", "Amble-Bold.ttf"), i)
+        self._fonts = FontCache(os.path.join(os.getcwd(), "font", "Amble-Bold.ttf"),
+                                (13, 15, 17, 19, 25))
 
         self._bg_box = pygame.Rect(0, 0, self._width, self._height)
         self._top_box = pygame.Rect(0, 0, self._width, 60)
         self._bottom_box = pygame.Rect(0, self._height - 60, self._width, 60)
         self._settings_box = pygame.Rect(0, self._height - 120, self._width, 60)
+        self._std_column_box = pygame.Rect(18, 114, 350, self._height - 234)
+        self._usr_column_box = pygame.Rect(518, 114, 350, self._height - 234)
+
+        self._exporter = ProcessPoolExecutor(max_workers = 1)
 
         self._tickboxes_img = pygame.image.load(os.path.join(os.getcwd(), "img", "tickboxes.png")).convert_alpha()
+        self._tick_green = self._tickboxes_img.subsurface((0, 0, 11, 11))
+        self._tick_red = self._tickboxes_img.subsurface((11, 0, 11, 11))
 
         self._stat_texts = {} # static texts
         self.setup_static_texts()
+        self.setup_static_background()
+        self._name_texts = {} # rendered simvar names
+        self._short_units = {} # units, truncated for display
+        self._value_cache = OrderedDict() # recently rendered value texts
         self._clock = pygame.time.Clock()
+        self._poll_event = pygame.USEREVENT + 1
+        pygame.time.set_timer(self._poll_event, 100) # store new samples at 10 Hz
 
         self._mode = "preflight"
+        self._stream = None # line-per-sample file of the current recording
+        self._MB_pos = (0, 0)
+        self._dirty = True # whether the window needs to be redrawn
         self._usertext = ""
         self._tickboxes = {}
+        self._tb_keys = [] # simvar of each row in self._tb_rects
+        self._tb_index = {} # simvar: row in self._tb_rects
+        self._tb_rects = np.zeros((0, 4), np.int32) # x0, y0, x1, y1 of each tickbox
         self.init_simconnect()
-        self._start_time = time.time()
+        self._start_time_ns = time.perf_counter_ns()
 
     def setup_static_texts(self):
         """ Render texts that do not change. """
@@ -71,30 +150,94 @@ class Recorder:
                                                                  True, self.WHITE)
         self._stat_texts["Stoprecord"] = self._fonts[25].render("Stop recording",
                                                                 True, self.WHITE)
+        self._start_x = (self._width - self._stat_texts["Startrecord"].get_width())//2
+        self._stop_x = (self._width - self._stat_texts["Stoprecord"].get_width())//2
+
+    def setup_static_background(self):
+        """ Draw the parts of the window that never change to a surface, and
+        show it. render only redraws the areas on top of it that can change.
+        """
+        self._static_bg = pygame.Surface(self._size).convert()
+        bg = self._static_bg
+        pygame.draw.rect(bg, self.GREY3, self._bg_box)
+        pygame.draw.rect(bg, self.GREY2, self._top_box)
+        pygame.draw.rect(bg, self.GREY2, self._settings_box)
+
+        bg.blit(self._stat_texts["Topleft title"], (18, 18))
+        bg.blit(self._stat_texts["Stdvals"], (18, 70))
+        bg.blit(self._stat_texts["Value"], (18, 96))
+        bg.blit(self._stat_texts["Curr"], (185, 96))
+        bg.blit(self._stat_texts["Plot"], (340, 96))
+
+        bg.blit(self._stat_texts["Usrvals"], (518, 70))
+        bg.blit(self._stat_texts["Value"], (518, 96))
+        bg.blit(self._stat_texts["Curr"], (685, 96))
+        bg.blit(self._stat_texts["Plot"], (840, 96))
+
+        self._screen.blit(bg, (0, 0))
+        pygame.display.flip()
+
+    def setup_name_texts(self):
+        """ Render the names of the tracked simvars and truncate their units
+        for display. These only change when the tracked simvars change.
+        """
+        for key, (name, unit) in self.data_units.items():
+            self._name_texts[key] = self._fonts[15].render(name, True, self.WHITE)
+            if len(unit) > 10:
+                unit = unit[:7] + "..."
+            self._short_units[key] = unit
+
+    def render_value(self, key, cents):
+        """ Render the value text of a simvar, given as an integer number of
+        hundredths (None if there is no value yet). Surfaces are cached on
+        (key, cents), keeping the 256 most recently used, so the text is only
+        formatted and rendered when the displayed value changes.
+        """
+        cache_key = (key, cents)
+        surf = self._value_cache.get(cache_key)
+        if surf is None:
+            if cents is None:
+                text = "---"
+            else:
+                text = f"{cents/100:.2f} {self._short_units[key]}"
+            surf = self._fonts[15].render(text, True, self.WHITE)
+            self._value_cache[cache_key] = surf
+            if len(self._value_cache) > 256:
+                self._value_cache.popitem(last = False)
+        else:
+            self._value_cache.move_to_end(cache_key)
+        return surf
 
     def on_event(self, event):
         """ Track Pygame events. """
         if event.type == pygame.QUIT:
             self._running = False
 
+        if event.type == self._poll_event and self._mode == "recording":
+            self.get_data()
+
+        if event.type == pygame.MOUSEMOTION:
+            # hover highlight of the bottom button only changes when crossing its edge
+            if (event.pos[1] < self._height - 60) != (self._MB_pos[1] < self._height - 60):
+                self._dirty = True
+            self._MB_pos = event.pos
+
         if event.type == pygame.MOUSEBUTTONDOWN:
             if event.button == 1:
+                self._dirty = True
                 if self._MB_pos[1] > self._height - 60:
                     if self._mode == "preflight":
-                        self._mode = "recording"
-                        self._start_time = time.time()
+                        self.start_recording()
                     else:
                         self.end_recording()
                 else:
                     MB_x = self._MB_pos[0]
                     MB_y = self._MB_pos[1]
-                    for key, item in self._tickboxes.items():
-                        ## all tickboxes are 11 wide and 11 high
-                        box_x = item.x
-                        box_y = item.y
-                        if MB_x > box_x and MB_x < box_x + 11:
-                            if MB_y > box_y and MB_y < box_y + 11:
-                                item.change_status()
+                    rects = self._tb_rects
+                    hits = ((MB_x >= rects[:, 0]) & (MB_x < rects[:, 2])
+                            & (MB_y >= rects[:, 1]) & (MB_y < rects[:, 3]))
+                    if hits.any():
+                        self._tickboxes[self._tb_keys[np.argmax(hits)]].change_status()
 
 
         if event.type == pygame.KEYDOWN:
@@ -107,61 +250,49 @@ class Recorder:
 
     def loop(self):
         """ Main loop. """
-        self._MB_pos = pygame.mouse.get_pos()
-
-        if self._mode == "recording":
-            self.get_data()
-
-        self._clock.tick_busy_loop(30)
+        # tick() sleeps between frames instead of busy-waiting. Nothing new
+        # arrives outside of recording, so redraw less often then.
+        self._clock.tick(30 if self._mode == "recording" else 15)
         self.fps = self._clock.get_fps()
 
-    def draw_data_column(self, data_dict, left, top):
+    def draw_data_column(self, arrays, left, top):
         """ Draw a list of variables and their values to a column on the display """
         text_y = top
-        for key, item in data_dict.items():
-            text_name = self._fonts[15].render(self.data_units[key][0], True, self.WHITE)
-            unit = self.data_units[key][1]
-            if len(unit) > 10:
-                unit = unit[:7] + "..."
-            try:
-                text_value = f"{item[-1]} {unit}"
-            except IndexError:
-                text_value = "---"
-            text_value = self._fonts[15].render(text_value, True, self.WHITE)
+        for key, item in arrays.items():
+            text_name = self._name_texts[key]
+            if self._n > 0:
+                cents = round(float(item[self._n - 1])*100)
+            else:
+                cents = None
+            text_value = self.render_value(key, cents)
             self._screen.blit(text_name, (left, text_y))
             self._screen.blit(text_value, (left + 168, text_y))
-            tickbox = self._tickboxes[key]
-            tickbox_image_left_crop = 11 # red
-            if tickbox():
-                tickbox_image_left_crop = 0 # green
+            if self._tickboxes[key]():
+                tickbox_image = self._tick_green
+            else:
+                tickbox_image = self._tick_red
 
-            tickbox.set_pos(left + 330, text_y + 4)            
-            self._screen.blit(self._tickboxes_img, (left + 330, text_y + 4), (tickbox_image_left_crop, 0, 11, 11))
+            ## all tickboxes are 11 wide and 11 high
+            self._tb_rects[self._tb_index[key]] = (left + 330, text_y + 4,
+                                                   left + 341, text_y + 15)
+            self._screen.blit(tickbox_image, (left + 330, text_y + 4))
             
             text_y += text_value.get_height() + 3
 
     def render(self):
-        """ Pygame render. """
-        pygame.draw.rect(self._screen, self.GREY3, self._bg_box)
-        pygame.draw.rect(self._screen, self.GREY2, self._top_box)
-        pygame.draw.rect(self._screen, self.GREY2, self._settings_box)
-
-        self._screen.blit(self._stat_texts["Topleft title"], (18, 18))
-        self._screen.blit(self._stat_texts["Stdvals"], (18, 70))
-        self._screen.blit(self._stat_texts["Value"], (18, 96))
-        self._screen.blit(self._stat_texts["Curr"], (185, 96))
-        self._screen.blit(self._stat_texts["Plot"], (340, 96))
-
-        self._screen.blit(self._stat_texts["Usrvals"], (518, 70))
-        self._screen.blit(self._stat_texts["Value"], (518, 96))
-        self._screen.blit(self._stat_texts["Curr"], (685, 96))
-        self._screen.blit(self._stat_texts["Plot"], (840, 96))
+        """ Pygame render. Only the value columns and the bottom button are
+        redrawn, the rest of the window stays as drawn by
+        setup_static_background.
+        """
+        dirty = [self._std_column_box, self._usr_column_box, self._bottom_box]
+        for rect in dirty:
+            self._screen.blit(self._static_bg, rect, rect)
 
         # Draw standard values
-        self.draw_data_column(self.data_dict, 18, 114)
+        self.draw_data_column(self._arrays, 18, 114)
 
         # Draw user defines values
-        self.draw_data_column(self.user_data_dict, 518, 114)
+        self.draw_data_column(self._user_arrays, 518, 114)
 
         if self._mode == "preflight":
             text = self._stat_texts["Startrecord"]
@@ -170,7 +301,7 @@ class Recorder:
             else:
                 color = self.DARKERGREEN
             pygame.draw.rect(self._screen, color, self._bottom_box)
-            self._screen.blit(text, (int(self._width/2 - text.get_width()/2), self._height - 45))
+            self._screen.blit(text, (self._start_x, self._height - 45))
         elif self._mode == "recording":
             text = self._stat_texts["Stoprecord"]
             if self._MB_pos[1] < self._height - 60:
@@ -178,12 +309,15 @@ class Recorder:
             else:
                 color = self.DARKERRED
             pygame.draw.rect(self._screen, color, self._bottom_box)
-            self._screen.blit(text, (int(self._width/2 - text.get_width()/2), self._height - 45))
+            self._screen.blit(text, (self._stop_x, self._height - 45))
 
-        pygame.display.flip()
+        pygame.display.update(dirty)
 
     def cleanup(self):
+        self._stop_polling.set()
+        self._close_stream()
         pygame.quit()
+        self._exporter.shutdown(wait = True) # let unfinished exports complete
 
     def execute(self):
         if self.init_UI() == False:
@@ -193,7 +327,9 @@ class Recorder:
             for event in pygame.event.get():
                 self.on_event(event)
             self.loop()
-            self.render()
+            if self._dirty:
+                self.render()
+                self._dirty = False
         self.cleanup()
 
     def init_simconnect(self):
@@ -211,76 +347,236 @@ class Recorder:
                            "PLANE_ALT_ABOVE_GROUND": ("Radar altitude", "feet"),
                            "PLANE_ALTITUDE": ("Altitude (AMSL)", "feet"),
                            "G_FORCE": ("G-force", "g")}
+        self._parse_user_vars_file()
         self.reset()
+
+        self._samples = queue.SimpleQueue() # (time, values) from the polling thread
+        self._stop_polling = threading.Event()
+        threading.Thread(target = self._poll_loop, daemon = True).start()
         print("Connected...")
 
+    def start_recording(self):
+        """ Start a new recording. Every stored sample is also written as a line
+        of JSON to data/<start time>.jsonl, so a flight isn't lost if the program
+        stops before the recording is ended.
+        """
+        self._timestring = datetime.now().isoformat(timespec='minutes').replace(":", "")
+        path = os.path.join(os.getcwd(), "data", f"{self._timestring}.jsonl")
+        self._stream = open(path, "wb")
+        self._start_time_ns = time.perf_counter_ns()
+        # the polling thread can still hand in a sample after end_recording,
+        # drop those and don't pair the next answers with an old request time
+        self._clear_samples()
+        self._requested_ns = None
+        self._mode = "recording"
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
     def end_recording(self):
         self._mode = "preflight"
-        timestring = datetime.now().isoformat(timespec='minutes').replace(":", "")
-        self.make_plot(f"{timestring}.pdf")
-        self.store_json(f"{timestring}.json")
-        self.show_plot()
+        self._dirty = True
+        self._clear_samples()
+        self._close_stream()
+        timestring = self._timestring
+        n = self._n
+        snapshot = {"_n": n,
+                    "_arrays": {key: arr[:n].copy() for key, arr in self._arrays.items()},
+                    "_user_arrays": {key: arr[:n].copy() for key, arr in self._user_arrays.items()},
+                    "_time_ns": self._time_ns[:n].copy()}
+        future = self._exporter.submit(export_recording, snapshot,
+                                       f"{timestring}.pdf", f"{timestring}.json")
+        future.add_done_callback(lambda future: self._export_done(future, snapshot))
         self.reset()
 
+    def _export_done(self, future, snapshot):
+        """ Report a failed export, or show the plot of a saved one. """
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"Couldn't export the recording: {error}")
+            return
+        if not self._running:
+            return # the program is closing
+        # a daemon process, an open plot window doesn't keep the program running
+        multiprocessing.Process(target = show_recording, args = (snapshot,),
+                                daemon = True).start()
+
     def reset(self):
-        """ (Re)set values tracking simulator state and (re)set data dictionaries. """
+        """ (Re)set values tracking simulator state and (re)set data buffers. """
         self.airborne = False
         self.has_been_airborne = False
         self.landing_detected = False
         self.landing_time = 0
-        self.airborne_list = []
-        self.time_elapsed = []
         self.landing_data = None
 
+        ## Sample storage: self._time_ns and the per-key arrays hold self._n
+        ## samples out of self._capacity slots before _grow_buffers is called.
+        self._capacity = 4096
+        self._n = 0
+        self._air_ring = np.zeros(100, np.uint8) # airborne state, last 100 ticks
+        self._air_count = 0 # number of airborne entries in self._air_ring
+        self._time_ns = np.empty(self._capacity, dtype = np.int64) # since start
+
         ## Standard values
-        self.data_dict = {"VERTICAL_SPEED": [],
-                          "AIRSPEED_TRUE": [],
-                          "AIRSPEED_INDICATED": [],
-                          "GROUND_VELOCITY": [],
-                          "PLANE_ALT_ABOVE_GROUND": [],
-                          "PLANE_ALTITUDE": [],
-                          "G_FORCE": []}
+        self._standard_keys = ("VERTICAL_SPEED",
+                               "AIRSPEED_TRUE",
+                               "AIRSPEED_INDICATED",
+                               "GROUND_VELOCITY",
+                               "PLANE_ALT_ABOVE_GROUND",
+                               "PLANE_ALTITUDE",
+                               "G_FORCE")
 
-        for key in self.data_dict:
-            if not key in self._tickboxes:
-                self._tickboxes[key] = TickBox(key)
+        for key in self._standard_keys:
+            self.add_tickbox(key)
 
-        self.load_user_vars()
+        self._init_buffers()
+        self.setup_requests()
 
-    def load_user_vars(self):
+    def _parse_user_vars_file(self):
         """ User defines values to track from user_values.txt
-        Set up the data dictionary for the user values.
+        Parse the file once into self._user_schema, a list of (simvar, name, unit),
+        and set up names, units and tickboxes for the user values.
         """
-        self.user_data_dict = {}
-        with open("user_values.txt", "r") as infile:
-            lines = infile.readlines()
-        
-        for line in lines:
-            if line[0] == "#":
-                continue
-            if "#" in line:
-                line = line.split("#")[0]
-            line_split = line.split(",")
-            if len(line_split) != 3:
-                print("Skipping line:", line)
-                continue
-            key = line_split[0]
-            self.user_data_dict[key] = []
-            self.data_units[key] = (line_split[1], line_split[2])
-            if not key in self._tickboxes:
-                self._tickboxes[key] = TickBox(key)
-
+        self._user_schema = []
+        with open("user_values.txt", "r", newline = "") as infile:
+            lines = (line.split("#", 1)[0] for line in infile if not line.startswith("#"))
+            for line_split in csv.reader(lines):
+                if not line_split:
+                    continue
+                if len(line_split) != 3:
+                    print("Skipping line:", ",".join(line_split))
+                    continue
+                key, name, unit = (field.strip() for field in line_split)
+                self._user_schema.append((key, name, unit))
+                self.data_units[key] = (name, unit)
+                self.add_tickbox(key)
+
+        self.setup_name_texts()
         print("User vars loaded...")
 
+    def _init_buffers(self):
+        """ Set up an empty sample buffer with one row per simvar (channel), the
+        standard values first and then the user values.
+        """
+        self._channels = [*self._standard_keys,
+                          *(key for key, name, unit in self._user_schema)]
+        self._buf = np.empty((len(self._channels), self._capacity), dtype = np.float32)
+        self._vs_idx = self._channels.index("VERTICAL_SPEED")
+        self._gv_idx = self._channels.index("GROUND_VELOCITY")
+        self._make_views()
+
+    def _make_views(self):
+        """ Point self._arrays (standard values) and self._user_arrays at the
+        rows of self._buf. Needs to be redone whenever self._buf is reallocated.
+        """
+        n_std = len(self._standard_keys)
+        self._arrays = {key: self._buf[i] for i, key in enumerate(self._channels[:n_std])}
+        self._user_arrays = {key: self._buf[i] for i, key in enumerate(self._channels)
+                             if i >= n_std}
+
+    def add_tickbox(self, key):
+        """ Create a tickbox for the simvar unless it already has one. Its
+        position is filled in by draw_data_column.
+        """
+        if key in self._tickboxes:
+            return
+        self._tickboxes[key] = TickBox(key)
+        self._tb_index[key] = len(self._tb_keys)
+        self._tb_keys.append(key)
+        self._tb_rects = np.vstack((self._tb_rects, np.zeros((1, 4), np.int32)))
+
+    def setup_requests(self):
+        """ Cache the request objects of SIM_ON_GROUND and the recorded channels
+        for fetch_values. Indexed simvars ("NAME:index") are read through
+        AircraftRequests.get instead.
+        """
+        arq = self._aircraftrequests
+        self._requests = {}
+        self._requested_ns = None # when the last requests were sent
+        for key in ["SIM_ON_GROUND", *self._channels]:
+            if ":" in key:
+                continue
+            request = arq.find(key)
+            if request is not None and request._deff_test():
+                self._requests[key] = request
+
+    def fetch_values(self):
+        """ Called from the polling thread. Returns the perf_counter_ns time of
+        the previous round of requests (None on the first call) and their answers
+        as simvar: value, with -999999 where none came, then sends the next round.
+        """
+        requests = self._requests
+        sample_ns = self._requested_ns
+        values = {}
+        for key, request in requests.items():
+            if request.outData is None:
+                values[key] = -999999
+            else:
+                values[key] = request.outData
+
+        # keys setup_requests found no request object for: one blocking get() each
+        for key in ["SIM_ON_GROUND", *self._channels]:
+            if not key in values:
+                values[key] = self._aircraftrequests.get(key)
+
+        self._requested_ns = time.perf_counter_ns()
+        for request in requests.values():
+            self._simconnect.request_data(request)
+
+        return sample_ns, values
+
+    def _grow_buffers(self):
+        """ Make room for more samples by doubling _time_ns and the channel buffer. """
+        self._capacity *= 2
+        self._time_ns = np.resize(self._time_ns, self._capacity)
+        self._buf = np.concatenate((self._buf, np.empty_like(self._buf)), axis = 1)
+        self._make_views()
+
+    def _poll_loop(self):
+        """ Runs in a background thread. While recording, fetch the simvar values
+        from the simulator every 100 ms and pass them on to the main thread, so
+        that waiting for SimConnect never stalls the UI.
+        """
+        while not self._stop_polling.wait(0.1):
+            if self._mode == "recording":
+                sample_ns, values = self.fetch_values()
+                if sample_ns is not None:
+                    self._samples.put((sample_ns, values))
+
+    def _clear_samples(self):
+        """ Throw away samples fetched by the polling thread but not stored yet. """
+        while True:
+            try:
+                self._samples.get_nowait()
+            except queue.Empty:
+                return
+
     def get_data(self):
-        """ Collect data from the simulator via SimConnect.
-        If the request times out, it will return -999999. There are many ways to
+        """ Store the samples the polling thread has collected since the last call. """
+        while self._mode == "recording":
+            try:
+                sample_ns, values = self._samples.get_nowait()
+            except queue.Empty:
+                return
+            if sample_ns < self._start_time_ns:
+                continue # requested before this recording started
+            self.store_sample(sample_ns, values)
+
+    def store_sample(self, sample_ns, values):
+        """ Store one set of values collected from the simulator via SimConnect.
+        If a request times out, it will return -999999. There are many ways to
         handle this, but in this case we keep the previous value (or set it to
         0 if there are no values yet).        
         """
-        arq = self._aircraftrequests
+        n = self._n
+        if n == self._capacity:
+            self._grow_buffers()
 
-        on_the_ground = arq.get("SIM_ON_GROUND")
+        on_the_ground = values["SIM_ON_GROUND"]
         if on_the_ground == -999999:
             pass # keep the last value for self.airborne
         else:
@@ -289,90 +585,96 @@ class Recorder:
                 print("Takeoff detected...")
                 self.has_been_airborne = True
 
-        self.airborne_list.append(self.airborne)
-        if len(self.airborne_list) > 100:
-            self.airborne_list.pop(0)
-
-        # Get standard values.
-        for key, item in self.data_dict.items():
-            item.append(round(arq.get(key), 2))
-            if item[-1] == -999999:
-                try:
-                    item[-1] = item[-2]
-                except IndexError:
-                    item[-1] = 0
-
-        # Get user defined values.
-        for key, item in self.user_data_dict.items():
-            item.append(round(arq.get(key), 2))
-            if item[-1] == -999999:
-                try:
-                    item[-1] = item[-2]
-                except IndexError:
-                    item[-1] = 0
-
-        time_elapsed = time.time() - self._start_time
-        self.time_elapsed.append(time_elapsed)
+        airborne = int(self.airborne)
+        self._air_count += airborne - int(self._air_ring[n % 100])
+        self._air_ring[n % 100] = airborne
+
+        # Get standard and user defined values, keeping the previous value for
+        # requests that timed out.
+        column = np.fromiter((values[key] for key in self._channels),
+                             dtype = np.float32, count = len(self._channels))
+        previous = self._buf[:, n - 1] if n > 0 else 0
+        self._buf[:, n] = np.where(column == -999999, previous, column)
+
+        elapsed_ns = sample_ns - self._start_time_ns
+        self._time_ns[n] = elapsed_ns
+        self._n = n + 1
+        self._dirty = True
+        self.stream_sample(n)
 
         if self.has_been_airborne and not self.airborne and not self.landing_detected:
             print("\nLanding detected...")
             self.landing_detected = True
-            self.landing_time = time_elapsed
+            self.landing_time = elapsed_ns * 1e-9
 
-            self.landing_data = self.data_dict.copy()
+            # snapshot of the data up to the landing, not a view of the live buffers
+            self.landing_data = {key: arr[:self._n].copy() for key, arr in self._arrays.items()}
         
-        speed_tot = np.sqrt(self.data_dict["VERTICAL_SPEED"][-1]**2
-                            + self.data_dict["GROUND_VELOCITY"][-1]**2)
-
-        if ((not any(self.airborne_list) or (speed_tot < 2 and not self.airborne))
-                                                        # if the plane has been on the ground for at
-                                                        # least 100 ticks, or it is standing still on the ground
-                and time_elapsed > 50         # AND more than 50 seconds have passed since the logger was started
-                and self.has_been_airborne    # AND the plane has at one point been airborne
-                and speed_tot < 30):          # AND the speed of the aircarft is less than 30
-            self.end_recording()              # stop logging
-
-    def make_plot(self, filename, skip_indices = 1):
-        """ Create and save the plot for the latest run. """
-        fig, axs = plt.subplots(2, 2, figsize = (13,10))
-        axs[1, 0].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["VERTICAL_SPEED"][::skip_indices],
-                       label = "Vertical speed")
+        if auto_end(float(self._buf[self._vs_idx, n]),
+                    float(self._buf[self._gv_idx, n]),
+                    self._air_count, elapsed_ns,
+                    self.has_been_airborne, self.airborne):
+            self.end_recording() # stop logging
+
+    def stream_sample(self, n):
+        """ Append sample n to the stream file of the recording as one line of JSON. """
+        row = {"ELAPSED_TIME": int(self._time_ns[n]) * 1e-9,
+               **dict(zip(self._channels, self._buf[:, n].tolist()))}
+        if orjson is not None:
+            self._stream.write(orjson.dumps(row) + b"\n")
+        else:
+            self._stream.write(json.dumps(row).encode() + b"\n")
+
+    def make_plot(self, filename = None, n_out = 2000):
+        """ Create the plot for the latest run, and save it if `filename` is given.
+        Every series is downsampled to at most `n_out` points with LTTB, which
+        keeps short peaks (e.g. the G-force at touchdown) visible.
+        """
+        n = self._n
+        arrays = self._arrays
+        time_elapsed = self._time_ns[:n] * 1e-9
+
+        import matplotlib.pyplot as plt # imported on first use, it is slow to load
+
+        fig, axs = plt.subplots(2, 2, figsize = (10,8), layout = "constrained")
+        axs[1, 0].plot(*lttb(time_elapsed, arrays["VERTICAL_SPEED"][:n], n_out),
+                       label = "Vertical speed",
+                       rasterized = True)
         axs[1, 0].set_xlabel("Time elapsed")
         axs[1, 0].set_ylabel("Speed [feet per minute]")
         axs[1, 0].legend()
 
-        axs[0, 1].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["AIRSPEED_TRUE"][::skip_indices],
-                       label = "True airspeed")
-        axs[0, 1].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["GROUND_VELOCITY"][::skip_indices],
-                       label = "Ground speed")
-        axs[0, 1].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["AIRSPEED_INDICATED"][::skip_indices],
-                       label = "Indicated airspeed")
+        axs[0, 1].plot(*lttb(time_elapsed, arrays["AIRSPEED_TRUE"][:n], n_out),
+                       label = "True airspeed",
+                       rasterized = True)
+        axs[0, 1].plot(*lttb(time_elapsed, arrays["GROUND_VELOCITY"][:n], n_out),
+                       label = "Ground speed",
+                       rasterized = True)
+        axs[0, 1].plot(*lttb(time_elapsed, arrays["AIRSPEED_INDICATED"][:n], n_out),
+                       label = "Indicated airspeed",
+                       rasterized = True)
         axs[0, 1].set_xlabel("Time elapsed")
         axs[0, 1].set_ylabel("Speed [knots]")
         axs[0, 1].legend()
 
-        axs[0, 0].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["PLANE_ALT_ABOVE_GROUND"][::skip_indices],
-                       label = "Radar altitude")
-        axs[0, 0].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["PLANE_ALTITUDE"][::skip_indices],
-                       label = "Altitude (AMSL)")
-        ground_level = (np.array(self.data_dict["PLANE_ALTITUDE"][::skip_indices])
-                        - np.array(self.data_dict["PLANE_ALT_ABOVE_GROUND"][::skip_indices]))
-        axs[0, 0].plot(self.time_elapsed[::skip_indices], ground_level,
+        axs[0, 0].plot(*lttb(time_elapsed, arrays["PLANE_ALT_ABOVE_GROUND"][:n], n_out),
+                       label = "Radar altitude",
+                       rasterized = True)
+        axs[0, 0].plot(*lttb(time_elapsed, arrays["PLANE_ALTITUDE"][:n], n_out),
+                       label = "Altitude (AMSL)",
+                       rasterized = True)
+        ground_level = arrays["PLANE_ALTITUDE"][:n] - arrays["PLANE_ALT_ABOVE_GROUND"][:n]
+        axs[0, 0].plot(*lttb(time_elapsed, ground_level, n_out),
                        label = "Ground level",
-                       color = "green")
+                       color = "green",
+                       rasterized = True)
         axs[0, 0].set_xlabel("Time elapsed")
         axs[0, 0].set_ylabel("Altitude [feet]")
         axs[0, 0].legend()
 
-        axs[1, 1].plot(self.time_elapsed[::skip_indices],
-                       self.data_dict["G_FORCE"][::skip_indices],
-                       label = "G-force")
+        axs[1, 1].plot(*lttb(time_elapsed, arrays["G_FORCE"][:n], n_out),
+                       label = "G-force",
+                       rasterized = True)
         axs[1, 1].set_xlabel("Time elapsed")
         axs[1, 1].set_ylabel("G-force")
         axs[1, 1].legend()
@@ -380,24 +682,48 @@ class Recorder:
         self.fig = fig
         self.axs = axs
 
-        path = os.path.join(os.getcwd(), "plots", filename)
-        self.fig.savefig(path, dpi = 300)
+        if filename is not None:
+            path = os.path.join(os.getcwd(), "plots", filename)
+            self.fig.savefig(path, dpi = 300)
 
     def show_plot(self):
         """ Shows the latest figure. """
+        import matplotlib.pyplot as plt
         plt.show()
 
     def store_json(self, filename):
         """ Store the latest data as a JSON file. """
         path = os.path.join(os.getcwd(), "data", filename)
-        store_dict = self.data_dict.copy()
-        store_dict["ELAPSED_TIME"] = self.time_elapsed
-        for key, item in self.user_data_dict.items():
-            store_dict[key] = item
-        with open(path, "w") as outfile:
-            json.dump(store_dict, outfile)
+        n = self._n
+        store_dict = {**{key: arr[:n] for key, arr in self._arrays.items()},
+                      "ELAPSED_TIME": self._time_ns[:n] * 1e-9,
+                      **{key: arr[:n] for key, arr in self._user_arrays.items()}}
+        if orjson is not None:
+            # orjson serializes the arrays directly, without going through lists
+            with open(path, "wb") as outfile:
+                outfile.write(orjson.dumps(store_dict, option = orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(path, "w") as outfile:
+                json.dump({key: arr.tolist() for key, arr in store_dict.items()}, outfile)
         
 
+class FontCache(dict):
+    """ Fonts by size. The font file is read once, only the given sizes are
+    created up front and any other size is created the first time it is used.
+    """
+    def __init__(self, path, sizes = ()):
+        super().__init__()
+        with open(path, "rb") as infile:
+            self._font_data = infile.read()
+        for size in sizes:
+            self[size]
+
+    def __missing__(self, size):
+        font = pygame.font.Font(io.BytesIO(self._font_data), size)
+        self[size] = font
+        return font
+
+
 class TickBox:
     """ Tick box. Can be connected to a simvar. """
     def __init__(self, simvar):